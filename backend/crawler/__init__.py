@@ -1,6 +1,6 @@
 """
 Crawler package: crawl a website and extract page metadata for llms.txt generation.
 """
-from .crawler import CrawlOptions, PageInfo, crawl_site
+from .crawler import CrawlOptions, PageInfo, close_session, crawl_site
 
-__all__ = ["crawl_site", "PageInfo", "CrawlOptions"]
+__all__ = ["crawl_site", "PageInfo", "CrawlOptions", "close_session"]
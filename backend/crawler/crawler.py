@@ -1,16 +1,22 @@
+import asyncio
+import hashlib
+import heapq
 import logging
 import time
 from dataclasses import dataclass
+from itertools import count
+from typing import Callable
 
 logger = logging.getLogger(__name__)
 from urllib.parse import urlparse
 
+import aiohttp
 import requests
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
 
 from .robots import get_robots_policy, is_path_allowed
 from .sitemap import fetch_sitemap_urls
-from .url_utils import get_origin, is_same_origin, normalize_url
+from .url_utils import get_origin, normalize_url
 
 USER_AGENT = "llms-txt-generator/1.0 (+https://github.com/llms-txt-generator)"
 
@@ -20,6 +26,8 @@ class PageInfo:
     url: str
     title: str
     description: str = ""
+    etag: str = ""
+    last_modified: str = ""
 
 
 @dataclass
@@ -31,117 +39,290 @@ class CrawlOptions:
     respect_robots: bool = True
     use_sitemap: bool = True
     sitemap_max_urls: int = 500
+    max_workers: int = 16
+    max_bytes: int = 2_000_000
+    url_scorer: Callable[[str], float] | None = None
+    # url -> raw page dict from the previous crawl (with etag/last_modified),
+    # used for conditional requests so unchanged pages skip download + parse.
+    previous_pages: dict[str, dict] | None = None
 
 
-def _extract_metadata(html: str, url: str) -> PageInfo:
-    soup = BeautifulSoup(html, "html.parser")
+# Sentinel for a 304 response: the previous page data is still valid.
+_NOT_MODIFIED = object()
+
+
+def _fp(url: str) -> int:
+    """8-byte URL fingerprint for visited/queued membership. A set of small
+    ints is far lighter than one of full URL strings, and collisions at 2^64
+    are negligible for crawl-scale sets."""
+    return int.from_bytes(hashlib.blake2b(url.encode(), digest_size=8).digest(), "big")
+
+
+def _path_depth(url: str) -> int:
+    path = urlparse(url).path or "/"
+    return sum(1 for s in path.split("/") if s)
+
+
+def _make_sync_session() -> requests.Session:
+    """requests Session for the robots.txt/sitemap fetches that run in a thread."""
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+# One shared aiohttp session for all crawls: the connector caches DNS and
+# pools connections across requests and across crawls of the same host.
+_session: aiohttp.ClientSession | None = None
+
+
+def _get_session() -> aiohttp.ClientSession:
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(limit=100, limit_per_host=8, ttl_dns_cache=300)
+        _session = aiohttp.ClientSession(
+            connector=connector, headers={"User-Agent": USER_AGENT}
+        )
+    return _session
+
+
+async def close_session() -> None:
+    """Close the shared aiohttp session (call on app shutdown)."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+class _RateLimiter:
+    """Spaces request starts at least `delay` seconds apart across workers."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def wait(self) -> None:
+        if self.delay <= 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            sleep_for = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.delay
+        if sleep_for > 0:
+            await asyncio.sleep(sleep_for)
+
+
+async def _fetch(session: aiohttp.ClientSession, url: str, opts: CrawlOptions, limiter: _RateLimiter):
+    """Fetch one page, honoring the shared rate limiter.
+    Returns (final_url, html, etag, last_modified), _NOT_MODIFIED on a 304, or None."""
+    await limiter.wait()
+    headers = {}
+    prev = (opts.previous_pages or {}).get(url)
+    if prev:
+        if prev.get("etag"):
+            headers["If-None-Match"] = prev["etag"]
+        if prev.get("last_modified"):
+            headers["If-Modified-Since"] = prev["last_modified"]
+    try:
+        async with session.get(
+            url,
+            timeout=aiohttp.ClientTimeout(total=opts.timeout),
+            allow_redirects=True,
+            headers=headers or None,
+        ) as r:
+            if r.status == 304:
+                return _NOT_MODIFIED
+            if r.status != 200:
+                return None
+            if "text/html" not in r.headers.get("Content-Type", ""):
+                return None
+            # Bounded read: reject oversized pages without downloading them fully.
+            raw = await r.content.read(opts.max_bytes + 1)
+            if len(raw) > opts.max_bytes:
+                return None
+            html = raw.decode(r.charset or "utf-8", errors="replace")
+            return (
+                normalize_url(str(r.url)),
+                html,
+                r.headers.get("ETag", ""),
+                r.headers.get("Last-Modified", ""),
+            )
+    except Exception:
+        return None
+
+
+def _extract_metadata(tree: LexborHTMLParser, url: str) -> PageInfo:
     title = ""
     desc = ""
 
-    tag = soup.find("title")
-    if tag and tag.string:
-        title = tag.string.strip() or ""
+    tag = tree.css_first("title")
+    if tag:
+        title = tag.text(strip=True) or ""
     if not title:
         title = url  # fallback
 
     # meta name="description"
-    meta = soup.find("meta", attrs={"name": "description"})
-    if meta and meta.get("content"):
-        desc = meta["content"].strip()
+    meta = tree.css_first('meta[name="description"]')
+    if meta:
+        desc = (meta.attributes.get("content") or "").strip()
     if not desc:
-        meta = soup.find("meta", attrs={"property": "og:description"})
-        if meta and meta.get("content"):
-            desc = meta["content"].strip()
+        meta = tree.css_first('meta[property="og:description"]')
+        if meta:
+            desc = (meta.attributes.get("content") or "").strip()
 
     return PageInfo(url=url, title=title, description=desc)
 
 
-def _extract_links(html: str, base_url: str, same_origin: str) -> list[str]:
-    soup = BeautifulSoup(html, "html.parser")
-    seen = set()
-    out = []
-    for a in soup.find_all("a", href=True):
-        href = a["href"].strip()
+def _extract_links(tree: LexborHTMLParser, base_url: str, same_origin: str) -> set[str]:
+    # normalize_url already canonicalizes scheme+netloc, so a prefix check
+    # against the origin replaces a urlparse per link.
+    same_origin_slash = same_origin + "/"
+    out: set[str] = set()
+    for a in tree.css("a[href]"):
+        href = (a.attributes.get("href") or "").strip()
         if not href or href.startswith(("#", "mailto:", "tel:", "javascript:")):
             continue
         u = normalize_url(href, base_url)
-        if is_same_origin(u, same_origin) and u not in seen:
-            seen.add(u)
-            out.append(u)
+        if u == same_origin or u.startswith(same_origin_slash):
+            out.add(u)
     return out
 
 
-def crawl_site(base_url: str, options: CrawlOptions | None = None) -> list[PageInfo]:
+async def crawl_site(base_url: str, options: CrawlOptions | None = None) -> list[PageInfo]:
     opts = options or CrawlOptions()
     base_url = normalize_url(base_url)
     origin = get_origin(base_url)
     logger.info("Crawl starting: url=%s max_pages=%d", base_url, opts.max_pages)
 
-    disallowed_patterns: list[str] = []
-    delay = opts.crawl_delay
-    if opts.respect_robots:
-        disallowed_patterns, robots_delay = get_robots_policy(origin, timeout=opts.timeout)
-        if robots_delay > 0:
-            delay = robots_delay
+    # robots.txt and the sitemap are a couple of requests at most; run the
+    # existing sync helpers in a thread rather than duplicating them on aiohttp.
+    sync_session = _make_sync_session()
+    try:
+        disallowed = None
+        delay = opts.crawl_delay
+        if opts.respect_robots:
+            disallowed, robots_delay = await asyncio.to_thread(
+                get_robots_policy, origin, timeout=opts.timeout, session=sync_session
+            )
+            if robots_delay > 0:
+                delay = robots_delay
+
+        sitemap_set: set[str] = set()
+        if opts.use_sitemap:
+            sitemap_set = set(
+                await asyncio.to_thread(
+                    fetch_sitemap_urls,
+                    origin,
+                    timeout=opts.timeout,
+                    max_urls=opts.sitemap_max_urls,
+                    session=sync_session,
+                )
+            )
+    finally:
+        sync_session.close()
 
     def path_allowed(url: str) -> bool:
         path = urlparse(url).path or "/"
-        return is_path_allowed(path, disallowed_patterns)
+        return is_path_allowed(path, disallowed)
 
-    to_visit: list[str] = []
-    if opts.use_sitemap:
-        sitemap_urls = fetch_sitemap_urls(
-            origin, timeout=opts.timeout, max_urls=opts.sitemap_max_urls
-        )
-        for u in sitemap_urls:
-            if path_allowed(u):
-                to_visit.append(u)
-    logger.info("Sitemap URLs: %s", sitemap_urls)
+    # Priority frontier: lower score crawls first. Shallow paths beat deep
+    # ones and sitemap-listed URLs get a boost, so a small max_pages budget
+    # goes to the pages most likely to matter instead of nav/footer links.
+    def score(url: str) -> float:
+        if opts.url_scorer is not None:
+            return opts.url_scorer(url)
+        return _path_depth(url) - (5.0 if url in sitemap_set else 0.0)
+
+    to_visit: list[tuple[float, int, str]] = []
+    queued: set[int] = set()
+    seq = count()
+    for u in sitemap_set:
+        f = _fp(u)
+        if f not in queued and path_allowed(u):
+            queued.add(f)
+            heapq.heappush(to_visit, (score(u), next(seq), u))
+    # Pages from the previous crawl are known-good URLs even when they were
+    # only discovered via links: a 304 yields no body to extract links from,
+    # so without this seed a recrawl of an unchanged site would shrink to
+    # sitemap-listed pages only.
+    for u in opts.previous_pages or ():
+        f = _fp(u)
+        if f not in queued and path_allowed(u):
+            queued.add(f)
+            heapq.heappush(to_visit, (score(u), next(seq), u))
     if not to_visit:
-        to_visit = [base_url]
+        queued.add(_fp(base_url))
+        heapq.heappush(to_visit, (score(base_url), next(seq), base_url))
     logger.info("Crawl seed: %d URLs to visit (sitemap=%s)", len(to_visit), opts.use_sitemap)
 
-    visited: set[str] = set[str]()
+    session = _get_session()
+    visited: set[int] = set()
     results: list[PageInfo] = []
+    limiter = _RateLimiter(delay)
+    workers = min(opts.max_workers, opts.max_pages)
+    pending: dict[asyncio.Task, str] = {}
 
-    while to_visit and len(results) < opts.max_pages:
-        url = to_visit.pop(0)
-        if url in visited:
-            continue
-        if not path_allowed(url):
-            continue
-        visited.add(url)
-
-        try:
-            r = requests.get(
-                url,
-                timeout=opts.timeout,
-                headers={"User-Agent": USER_AGENT},
-                allow_redirects=True,
-            )
-            if r.status_code != 200:
+    while (to_visit or pending) and len(results) < opts.max_pages:
+        # Keep the fetchers fed, but never fetch more pages than the budget allows.
+        while (
+            to_visit
+            and len(pending) < workers
+            and len(results) + len(pending) < opts.max_pages
+        ):
+            _, _, url = heapq.heappop(to_visit)
+            f = _fp(url)
+            if f in visited or not path_allowed(url):
                 continue
-            final_url = normalize_url(r.url)
-            if final_url != url:
-                visited.add(final_url)
-            html = r.text
-            logger.info("HTML: %s", html)
-        except Exception:
+            visited.add(f)
+            pending[asyncio.create_task(_fetch(session, url, opts, limiter))] = url
+        if not pending:
+            if not to_visit:
+                break
             continue
 
-        info = _extract_metadata(html, final_url)
-        results.append(info)
-        if len(results) % 10 == 0 or len(results) == 1:
-            logger.info("Crawled %d pages so far (current: %s)", len(results), final_url[:80])
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            req_url = pending.pop(task)
+            fetched = task.result()
+            if not fetched or len(results) >= opts.max_pages:
+                continue
+            if fetched is _NOT_MODIFIED:
+                # Unchanged since last crawl: reuse the stored page data
+                # without downloading or parsing the body.
+                prev = (opts.previous_pages or {}).get(req_url) or {}
+                results.append(
+                    PageInfo(
+                        url=req_url,
+                        title=prev.get("title", "") or req_url,
+                        description=prev.get("description", ""),
+                        etag=prev.get("etag", ""),
+                        last_modified=prev.get("last_modified", ""),
+                    )
+                )
+                continue
+            final_url, html, etag, last_modified = fetched
+            visited.add(_fp(final_url))
+
+            tree = LexborHTMLParser(html)
+            info = _extract_metadata(tree, final_url)
+            info.etag = etag
+            info.last_modified = last_modified
+            results.append(info)
+            if len(results) % 10 == 0 or len(results) == 1:
+                logger.info("Crawled %d pages so far (current: %s)", len(results), final_url[:80])
 
-        for link in _extract_links(html, final_url, origin):
-            logger.info("Link: %s", link)
-            if link not in visited and link not in to_visit and path_allowed(link):
-                logger.info("Adding link to visit: %s", link)
-                to_visit.append(link)
+            # Once the frontier already covers the page budget, newly
+            # discovered links could never be crawled - skip extraction.
+            if len(results) + len(to_visit) < opts.max_pages:
+                link_fps = {_fp(l): l for l in _extract_links(tree, final_url, origin)}
+                for f in link_fps.keys() - visited - queued:
+                    link = link_fps[f]
+                    if path_allowed(link):
+                        queued.add(f)
+                        heapq.heappush(to_visit, (score(link), next(seq), link))
 
-        if delay > 0:
-            time.sleep(delay)
+    for task in pending:
+        task.cancel()
 
     logger.info("Crawl finished: %d pages from %s", len(results), base_url)
     return results
@@ -9,15 +9,18 @@ USER_AGENT = "llms-txt-generator/1.0 (+https://github.com/llms-txt-generator)"
 DEFAULT_CRAWL_DELAY = 0.5
 
 
-def fetch_robots_txt(site_origin: str, timeout: int = 10) -> str:
+def fetch_robots_txt(site_origin: str, timeout: int = 10, session: requests.Session | None = None) -> str:
     url = get_robots_url(site_origin)
     try:
-        r = requests.get(
-            url,
-            timeout=timeout,
-            headers={"User-Agent": USER_AGENT},
-            allow_redirects=True,
-        )
+        if session is not None:
+            r = session.get(url, timeout=timeout, allow_redirects=True)
+        else:
+            r = requests.get(
+                url,
+                timeout=timeout,
+                headers={"User-Agent": USER_AGENT},
+                allow_redirects=True,
+            )
         if r.status_code == 200:
             return r.text
     except Exception:
@@ -25,7 +28,7 @@ def fetch_robots_txt(site_origin: str, timeout: int = 10) -> str:
     return ""
 
 
-def parse_robots(robots_txt: str, user_agent: str = "*") -> tuple[list[str], float]:
+def parse_robots(robots_txt: str, user_agent: str = "*") -> tuple[re.Pattern | None, float]:
     disallowed: list[str] = []
     crawl_delay = 0.0
     current_agents: list[str] | None = None
@@ -45,49 +48,54 @@ def parse_robots(robots_txt: str, user_agent: str = "*") -> tuple[list[str], flo
 
     for line in robots_txt.splitlines():
         line = line.split("#", 1)[0].strip()
-        if not line:
+        if not line or ":" not in line:
             continue
-        if line.lower().startswith("user-agent:"):
+        key, _, rest = line.partition(":")
+        key = key.strip().lower()
+        rest = rest.strip()
+        if key == "user-agent":
             flush_block()
-            agent = line.split(":", 1)[1].strip().lower()
-            current_agents = [agent]
-        elif current_agents is not None:
-            low = line.lower()
-            if low.startswith("disallow:"):
-                path = line.split(":", 1)[1].strip()
-                if path:
-                    pattern = re.escape(path).replace(r"\*", ".*")
-                    block_disallowed.append(pattern)
-            elif low.startswith("crawl-delay:"):
-                try:
-                    value = line.split(":", 1)[1].strip().split()[0]
-                    block_delay = float(value)
-                except (ValueError, IndexError):
-                    pass
+            current_agents = [rest.lower()]
+        elif current_agents is None:
+            continue
+        elif key == "disallow":
+            if rest:
+                block_disallowed.append(rest)
+        elif key == "crawl-delay":
+            try:
+                block_delay = float(rest.split()[0])
+            except (ValueError, IndexError):
+                pass
 
     flush_block()
-    return disallowed, crawl_delay
+    if not disallowed:
+        return None, crawl_delay
+    # Raw Disallow paths get their '*' wildcards translated and combined into
+    # one alternation here, so each path check is a single C-level match.
+    patterns = [re.escape(p).replace(r"\*", ".*") for p in disallowed]
+    return re.compile("^(?:" + "|".join(patterns) + ")"), crawl_delay
 
 
-def is_path_allowed(path: str, disallowed_patterns: list[str]) -> bool:
-    """Return False if path is disallowed by any of the patterns (regex match)."""
+def is_path_allowed(path: str, disallowed: re.Pattern | None) -> bool:
+    """Return False if path matches the combined Disallow pattern."""
+    if disallowed is None:
+        return True
     if not path:
         path = "/"
     if not path.startswith("/"):
         path = "/" + path
-    for pattern in disallowed_patterns:
-        if re.match(pattern, path):
-            return False
-    return True
+    return not disallowed.match(path)
 
 
-def get_robots_policy(site_origin: str, timeout: int = 10) -> tuple[list[str], float]:
+def get_robots_policy(
+    site_origin: str, timeout: int = 10, session: requests.Session | None = None
+) -> tuple[re.Pattern | None, float]:
     """
     Fetch and parse robots.txt for site_origin.
-    Returns (disallowed_path_patterns, crawl_delay_seconds).
+    Returns (combined_disallow_pattern_or_None, crawl_delay_seconds).
     Uses DEFAULT_CRAWL_DELAY if robots.txt has no Crawl-delay.
     """
-    text = fetch_robots_txt(site_origin, timeout=timeout)
+    text = fetch_robots_txt(site_origin, timeout=timeout, session=session)
     disallowed, crawl_delay = parse_robots(text)
     if crawl_delay <= 0:
         crawl_delay = DEFAULT_CRAWL_DELAY
@@ -1,47 +1,105 @@
+from io import BytesIO
 from xml.etree import ElementTree as ET
 
 import requests
 
+try:
+    from lxml import etree as _etree
+except ImportError:
+    _etree = None
+
 from .url_utils import get_origin, get_sitemap_url, is_same_origin, normalize_url
 
 USER_AGENT = "llms-txt-generator/1.0 (+https://github.com/llms-txt-generator)"
 
-SITEMAP_NS = {"sm": "http://www.sitemaps.org/schemas/sitemap/0.9"}
+
+def _get(url: str, timeout: int, session: requests.Session | None):
+    if session is not None:
+        return session.get(url, timeout=timeout, allow_redirects=True)
+    return requests.get(
+        url,
+        timeout=timeout,
+        headers={"User-Agent": USER_AGENT},
+        allow_redirects=True,
+    )
+
+
+def _local_name(tag) -> str:
+    if not isinstance(tag, str):
+        return ""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _parse_sitemap_locs(content: bytes, max_locs: int) -> tuple[bool, list[str]]:
+    """
+    Stream <loc> texts out of sitemap XML without building the full tree.
+    Returns (is_index, locs); bails out as soon as enough locs are collected
+    (one for a sitemap index, since only the first child sitemap is used).
+    """
+    locs: list[str] = []
+    is_index = False
+    limit = max_locs
+    first = True
+    if _etree is not None:
+        events = _etree.iterparse(BytesIO(content), events=("start", "end"), recover=True)
+    else:
+        events = ET.iterparse(BytesIO(content), events=("start", "end"))
+    try:
+        for event, elem in events:
+            if first and event == "start":
+                is_index = _local_name(elem.tag) == "sitemapindex"
+                if is_index:
+                    limit = 1
+                first = False
+                continue
+            if event == "end":
+                if _local_name(elem.tag) == "loc" and elem.text:
+                    locs.append(elem.text.strip())
+                    if len(locs) >= limit:
+                        break
+                elem.clear()
+    except Exception:
+        pass  # malformed/truncated XML: keep whatever was collected
+    return is_index, locs
+
+
+def _filter_urls(locs: list[str], site_origin: str, max_urls: int) -> list[str]:
+    result: list[str] = []
+    seen: set[str] = set()
+    for loc in locs:
+        u = normalize_url(loc)
+        if u in seen or not is_same_origin(u, site_origin):
+            continue
+        seen.add(u)
+        result.append(u)
+        if len(result) >= max_urls:
+            break
+    return result
 
 
-def fetch_sitemap_urls(site_origin: str, timeout: int = 10, max_urls: int = 500) -> list[str]:
+def fetch_sitemap_urls(
+    site_origin: str,
+    timeout: int = 10,
+    max_urls: int = 500,
+    session: requests.Session | None = None,
+) -> list[str]:
     url = get_sitemap_url(site_origin)
     try:
-        r = requests.get(
-            url,
-            timeout=timeout,
-            headers={"User-Agent": USER_AGENT},
-            allow_redirects=True,
-        )
+        r = _get(url, timeout, session)
         if r.status_code != 200:
             return []
     except Exception:
         return []
 
-    try:
-        root = ET.fromstring(r.content)
-    except ET.ParseError:
-        return []
-
-    # Check for sitemap index: <sitemap><loc>...</loc></sitemap>
-    sitemap_locs = root.findall(".//sm:sitemap/sm:loc", SITEMAP_NS)
-    if not sitemap_locs:
-        sitemap_locs = root.findall(".//sitemap/loc")  # no namespace
-
-    if sitemap_locs:
+    is_index, locs = _parse_sitemap_locs(r.content, max_urls)
+    if is_index:
         # Sitemap index: we only take the first sitemap to keep it simple and fast
-        first_loc = sitemap_locs[0]
-        if first_loc is not None and first_loc.text:
-            child_url = first_loc.text.strip()
-            return _urls_from_sitemap_xml(child_url, site_origin, timeout, max_urls)
+        if locs:
+            return _urls_from_sitemap_xml(locs[0].strip(), site_origin, timeout, max_urls, session=session)
+        return []
 
     # Plain sitemap: <url><loc>...</loc></url>
-    return _urls_from_sitemap_xml(url, site_origin, timeout, max_urls, root=root)
+    return _filter_urls(locs, site_origin, max_urls)
 
 
 def _urls_from_sitemap_xml(
@@ -49,32 +107,13 @@ def _urls_from_sitemap_xml(
     site_origin: str,
     timeout: int,
     max_urls: int,
-    root=None,
+    session: requests.Session | None = None,
 ) -> list[str]:
-    if root is None:
-        try:
-            r = requests.get(
-                source_url,
-                timeout=timeout,
-                headers={"User-Agent": USER_AGENT},
-                allow_redirects=True,
-            )
-            if r.status_code != 200:
-                return []
-            root = ET.fromstring(r.content)
-        except Exception:
+    try:
+        r = _get(source_url, timeout, session)
+        if r.status_code != 200:
             return []
-
-    url_locs = root.findall(".//sm:url/sm:loc", SITEMAP_NS)
-    if not url_locs:
-        url_locs = root.findall(".//url/loc")
-
-    result = []
-    for loc in url_locs:
-        if loc is not None and loc.text:
-            u = normalize_url(loc.text.strip())
-            if is_same_origin(u, site_origin) and u not in result:
-                result.append(u)
-                if len(result) >= max_urls:
-                    break
-    return result
+    except Exception:
+        return []
+    _, locs = _parse_sitemap_locs(r.content, max_urls)
+    return _filter_urls(locs, site_origin, max_urls)
@@ -1,7 +1,13 @@
 from dataclasses import dataclass
+from functools import lru_cache
 from urllib.parse import urljoin, urlparse, urlunparse
 
+# These are pure functions of their string arguments and get called several
+# times per URL across dedup, link extraction, and path checks, so memoizing
+# them turns the repeated urlparse + reassembly work into a dict lookup.
 
+
+@lru_cache(maxsize=8192)
 def normalize_url(url: str, base: str | None = None) -> str:
     if base:
         url = urljoin(base, url)
@@ -19,6 +25,7 @@ def normalize_url(url: str, base: str | None = None) -> str:
     return normalized.rstrip("/") or normalized
 
 
+@lru_cache(maxsize=8192)
 def get_origin(url: str) -> str:
     parsed = urlparse(url)
     return f"{parsed.scheme or 'https'}://{parsed.netloc}"
@@ -29,11 +36,13 @@ def is_same_origin(url: str, base_origin: str) -> bool:
     return get_origin(url) == base_origin
 
 
+@lru_cache(maxsize=128)
 def get_robots_url(base_url: str) -> str:
     origin = get_origin(base_url)
     return urljoin(origin + "/", "robots.txt")
 
 
+@lru_cache(maxsize=128)
 def get_sitemap_url(base_url: str) -> str:
     origin = get_origin(base_url)
     return urljoin(origin + "/", "sitemap.xml")
@@ -2,10 +2,24 @@
 import json
 import os
 import sqlite3
+import threading
 from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
 
+from cachetools import TTLCache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps(obj) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj)
+
 _backend_dir = Path(__file__).resolve().parent
 _default_db = _backend_dir / "llms_txt.db"
 
@@ -25,11 +39,37 @@ def _get_db_path() -> Path:
     return _default_db
 
 
+# Connections are cached instead of opened per call: for Postgres a small
+# shared pool (TCP+TLS+auth handshake per query would dwarf the query itself),
+# for SQLite one connection per thread (sqlite3 connections are not shareable
+# across threads by default).
+_local = threading.local()
+_pg_pool = None
+_pg_pool_lock = threading.Lock()
+
+
+def _get_pg_pool():
+    global _pg_pool
+    if _pg_pool is None:
+        with _pg_pool_lock:
+            if _pg_pool is None:
+                from psycopg2.pool import ThreadedConnectionPool
+                # Sized for API concurrency, not just the crawl pipeline:
+                # every endpoint goes through db.*, so keep a handful warm
+                # and allow bursts without queueing on connection setup.
+                _pg_pool = ThreadedConnectionPool(
+                    minconn=int(os.getenv("DB_POOL_MIN", "5")),
+                    maxconn=int(os.getenv("DB_POOL_MAX", "25")),
+                    dsn=os.getenv("DATABASE_URL"),
+                )
+    return _pg_pool
+
+
 @contextmanager
 def get_conn():
     if _is_postgres():
-        import psycopg2
-        conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+        pool = _get_pg_pool()
+        conn = pool.getconn()
         try:
             yield conn
             conn.commit()
@@ -37,19 +77,20 @@ def get_conn():
             conn.rollback()
             raise
         finally:
-            conn.close()
+            pool.putconn(conn)
     else:
-        path = _get_db_path()
-        conn = sqlite3.connect(str(path) if path != Path(":memory:") else ":memory:")
-        conn.row_factory = sqlite3.Row
+        conn = getattr(_local, "conn", None)
+        if conn is None:
+            path = _get_db_path()
+            conn = sqlite3.connect(str(path) if path != Path(":memory:") else ":memory:")
+            conn.row_factory = sqlite3.Row
+            _local.conn = conn
         try:
             yield conn
             conn.commit()
         except Exception:
             conn.rollback()
             raise
-        finally:
-            conn.close()
 
 
 def _run(conn, sql: str, params: tuple = ()):
@@ -86,6 +127,45 @@ def _normalize_site(row: dict | None) -> dict | None:
     return row
 
 
+# --- Read cache -----------------------------------------------------------
+# site_get_by_id / llms_txt_get_latest back every read endpoint and run
+# again inside the crawl pipeline; dashboards and pollers hit them far more
+# often than the rows change. Short-TTL caches absorb those repeats, and
+# every write path for a site pops its entries.
+
+_site_cache: TTLCache = TTLCache(maxsize=4096, ttl=60)
+_llms_cache: TTLCache = TTLCache(maxsize=4096, ttl=60)
+_cache_lock = threading.Lock()
+
+
+def _cache_invalidate(site_id: int) -> None:
+    with _cache_lock:
+        _site_cache.pop(site_id, None)
+        _llms_cache.pop(site_id, None)
+
+
+def site_get_by_id_cached(site_id: int) -> dict | None:
+    with _cache_lock:
+        row = _site_cache.get(site_id)
+    if row is None:
+        row = site_get_by_id(site_id)
+        if row is not None:
+            with _cache_lock:
+                _site_cache[site_id] = row
+    return row
+
+
+def llms_txt_get_latest_cached(site_id: int) -> dict | None:
+    with _cache_lock:
+        row = _llms_cache.get(site_id)
+    if row is None:
+        row = llms_txt_get_latest(site_id)
+        if row is not None:
+            with _cache_lock:
+                _llms_cache[site_id] = row
+    return row
+
+
 def init_db():
     if _is_postgres():
         _init_db_postgres()
@@ -211,45 +291,48 @@ def site_get_by_url(root_url: str) -> dict | None:
     return _normalize_site(row)
 
 
-def crawl_result_save(site_id: int, page_count: int, raw_pages: list[dict]) -> int:
+def persist_crawl(site_id: int, raw_pages: list[dict], content: str, next_at: str) -> int:
+    """Save a crawl result, its llms.txt, and the site's next crawl time on one
+    connection in one commit instead of three separate round-trips.
+    Returns the crawl_result id."""
     now = _now()
-    raw_json = json.dumps(raw_pages)
-
+    raw_json = _dumps(raw_pages)
     with get_conn() as conn:
         if _is_postgres():
             row = _fetchone(
                 conn,
                 """INSERT INTO crawl_results (site_id, finished_at, page_count, raw_pages) VALUES (%s, %s, %s, %s::jsonb) RETURNING id""",
-                (site_id, now, page_count, raw_json),
+                (site_id, now, len(raw_pages), raw_json),
             )
-            return row["id"]
-        cur = _run(
+            crawl_result_id = row["id"]
+        else:
+            cur = _run(
+                conn,
+                "INSERT INTO crawl_results (site_id, finished_at, page_count, raw_pages) VALUES (%s, %s, %s, %s)",
+                (site_id, now, len(raw_pages), raw_json),
+            )
+            crawl_result_id = cur.lastrowid
+        _run(
             conn,
-            "INSERT INTO crawl_results (site_id, finished_at, page_count, raw_pages) VALUES (%s, %s, %s, %s)",
-            (site_id, now, page_count, raw_json),
+            "INSERT INTO llms_txt (site_id, crawl_result_id, content, generated_at) VALUES (%s, %s, %s, %s)",
+            (site_id, crawl_result_id, content, now),
         )
-        return cur.lastrowid
-
+        _run(
+            conn,
+            "UPDATE sites SET next_crawl_at = %s, updated_at = %s WHERE id = %s",
+            (next_at, now, site_id),
+        )
+    _cache_invalidate(site_id)
+    return crawl_result_id
 
-def llms_txt_save(site_id: int, crawl_result_id: int, content: str) -> int:
-    now = _now()
 
+def crawl_result_get_latest(site_id: int) -> dict | None:
     with get_conn() as conn:
-        if _is_postgres():
-            row = _fetchone(
-                conn,
-                """INSERT INTO llms_txt (site_id, crawl_result_id, content, generated_at) VALUES (%s, %s, %s, %s) RETURNING id""",
-                (site_id, crawl_result_id, content, now),
-            )
-            _run(conn, "UPDATE sites SET updated_at = %s WHERE id = %s", (now, site_id))
-            return row["id"]
-        cur = _run(
+        return _fetchone(
             conn,
-            "INSERT INTO llms_txt (site_id, crawl_result_id, content, generated_at) VALUES (%s, %s, %s, %s)",
-            (site_id, crawl_result_id, content, now),
+            "SELECT * FROM crawl_results WHERE site_id = %s ORDER BY finished_at DESC LIMIT 1",
+            (site_id,),
         )
-        _run(conn, "UPDATE sites SET updated_at = %s WHERE id = %s", (now, site_id))
-        return cur.lastrowid
 
 
 def llms_txt_get_latest(site_id: int) -> dict | None:
@@ -269,9 +352,3 @@ def sites_get_due_for_crawl() -> list[dict]:
     with get_conn() as conn:
         rows = _fetchall(conn, sql, (now,))
     return rows
-
-
-def site_update_next_crawl_at(site_id: int, next_at: str) -> None:
-    now = _now()
-    with get_conn() as conn:
-        _run(conn, "UPDATE sites SET next_crawl_at = %s, updated_at = %s WHERE id = %s", (next_at, now, site_id))
@@ -1,7 +1,9 @@
 """Generate llms.txt markdown from PageInfo. Spec: https://llmstxt.org/"""
+import io
 import logging
 from collections import defaultdict
 from dataclasses import dataclass
+from functools import lru_cache
 from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
@@ -32,10 +34,13 @@ _LOCALE_LIKE = frozenset({
 _OPTIONAL_SEGMENTS = frozenset({"legal", "privacy", "terms", "cookies", "cookie", "optional"})
 
 
+_MD_ESCAPE = str.maketrans({"\\": "\\\\", "[": "\\[", "]": "\\]"})
+
+
 def _escape_md(s: str) -> str:
     if not s:
         return s
-    return s.replace("\\", "\\\\").replace("[", "\\[").replace("]", "\\]")
+    return s.translate(_MD_ESCAPE)
 
 
 def _normalize_for_compare(url: str) -> str:
@@ -45,11 +50,13 @@ def _normalize_for_compare(url: str) -> str:
     return u or "/"
 
 
+@lru_cache(maxsize=2048)
 def _path_segments(path: str) -> list[str]:
     """Return non-empty path segments, lowercased."""
     return [s.lower() for s in (path or "/").strip("/").split("/") if s]
 
 
+@lru_cache(maxsize=2048)
 def _infer_section_key(path: str) -> str:
     segments = _path_segments(path)
     if not segments:
@@ -72,29 +79,33 @@ def _section_key_to_title(key: str, default_section: str) -> str:
     return key.replace("-", " ").title()
 
 
-def _section_for_url(url: str, options: GeneratorOptions) -> str:
-    parsed = urlparse(url)
-    path = (parsed.path or "/").lower()
-
-    if options.auto_sections:
+@lru_cache(maxsize=2048)
+def _section_for_path(
+    path: str,
+    auto_sections: bool,
+    default_section: str,
+    optional_paths: tuple[str, ...],
+    section_rules: tuple[tuple[str, str], ...],
+    segment_rules: tuple[tuple[str, str], ...],
+) -> str:
+    """Section title for an already-lowercased URL path. Options arrive as
+    hashable tuples so results memoize across pages and crawls."""
+    if auto_sections:
         key = _infer_section_key(path)
-        return _section_key_to_title(key, options.default_section)
+        return _section_key_to_title(key, default_section)
 
-    if options.optional_paths:
-        for prefix in options.optional_paths:
-            if path.startswith(prefix.rstrip("/").lower()) or path == prefix.lower():
-                return "Optional"
+    for prefix in optional_paths:
+        if path.startswith(prefix.rstrip("/").lower()) or path == prefix.lower():
+            return "Optional"
     segments = _path_segments(path)
-    rules = options.section_rules or []
-    for prefix, section_name in rules:
+    for prefix, section_name in section_rules:
         p = prefix.lower().rstrip("/")
         if p and (path.startswith(p + "/") or path == p):
             return section_name
-    seg_rules = options.segment_rules or []
-    for segment, section_name in seg_rules:
+    for segment, section_name in segment_rules:
         if segment.lower() in segments:
             return section_name
-    return options.default_section
+    return default_section
 
 
 def _find_homepage(pages: list, base_url: str | None) -> tuple[str, str]:
@@ -135,45 +146,42 @@ def generate_llms_txt(pages: list, options: GeneratorOptions | None = None) -> s
     if opts.summary is not None:
         summary = opts.summary.strip()
 
+    optional_paths = tuple(opts.optional_paths or ())
+    section_rules = tuple(opts.section_rules or ())
+    segment_rules = tuple(opts.segment_rules or ())
     groups: dict[str, list] = defaultdict(list)
-    section_order: list[str] = []
     for p in pages:
-        url = getattr(p, "url", "")
-        section = _section_for_url(url, opts)
-        if section not in section_order:
-            section_order.append(section)
+        path = (urlparse(p.url).path or "/").lower()
+        section = _section_for_path(
+            path, opts.auto_sections, opts.default_section,
+            optional_paths, section_rules, segment_rules,
+        )
         groups[section].append(p)
 
-    lines: list[str] = []
-    lines.append(f"# {title}")
-    lines.append("")
+    buf = io.StringIO()
+    w = buf.write
+    w(f"# {title}\n\n")
     if summary:
-        lines.append(f"> {summary}")
-        lines.append("")
+        w(f"> {summary}\n\n")
     main_label = opts.default_section
-    ordered = [s for s in section_order if s != "Optional"]
-    if main_label in ordered:
-        ordered.remove(main_label)
-        ordered.insert(0, main_label)
-    ordered.sort(key=lambda s: (0 if s == main_label else 1, s.lower()))
-    if "Optional" in section_order:
+    ordered = sorted(
+        (s for s in groups if s != "Optional"),
+        key=lambda s: (0 if s == main_label else 1, s.lower()),
+    )
+    if "Optional" in groups:
         ordered.append("Optional")
     for section in ordered:
-        items = groups.get(section, [])
-        if not items:
-            continue
-        lines.append(f"## {section}")
-        lines.append("")
-        for p in items:
-            url = getattr(p, "url", "")
-            t = (getattr(p, "title", None) or "").strip() or url
-            desc = (getattr(p, "description", None) or "").strip()
+        w(f"## {section}\n\n")
+        for p in groups[section]:
+            url = p.url
+            t = (p.title or "").strip() or url
+            desc = (p.description or "").strip()
             if desc:
-                lines.append(f"- [{t}]({url}): {_escape_md(desc)}")
+                w(f"- [{t}]({url}): {_escape_md(desc)}\n")
             else:
-                lines.append(f"- [{t}]({url})")
-        lines.append("")
+                w(f"- [{t}]({url})\n")
+        w("\n")
 
-    out = "\n".join(lines).rstrip() + "\n"
+    out = buf.getvalue().rstrip() + "\n"
     logger.info("Generate finished: %d sections, %d chars", len(ordered), len(out))
     return out
@@ -1,35 +1,63 @@
+import asyncio
+import hmac
+import json
 import logging
 import os
-import re
-from datetime import datetime, timedelta, timezone
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from operator import attrgetter
 from pathlib import Path
 
 from dotenv import load_dotenv
-from fastapi import BackgroundTasks, FastAPI, Header, HTTPException, Path as PathParam
+from fastapi import FastAPI, Header, HTTPException, Path as PathParam, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, PlainTextResponse
-from pydantic import BaseModel, field_validator
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel, HttpUrl, TypeAdapter, field_validator
 
 import db
+from crawler import CrawlOptions, close_session, crawl_site
+from generator import GeneratorOptions, generate_llms_txt
 
 logger = logging.getLogger(__name__)
 
 SCHEDULE_INTERVALS = {
-    "15min": timedelta(minutes=15),
-    "hourly": timedelta(hours=1),
-    "daily": timedelta(days=1),
-    "weekly": timedelta(weeks=1),
+    "15min": 900,
+    "hourly": 3600,
+    "daily": 86400,
+    "weekly": 604800,
 }
 
+_DEFAULT_INTERVAL = SCHEDULE_INTERVALS["15min"]
+
 
 def _next_crawl_at(schedule: str | None) -> str:
-    delta = SCHEDULE_INTERVALS.get((schedule or "15min").lower(), SCHEDULE_INTERVALS["15min"])
-    return (datetime.now(timezone.utc) + delta).isoformat()
+    key = schedule.lower() if schedule else "15min"
+    seconds = SCHEDULE_INTERVALS.get(key, _DEFAULT_INTERVAL)
+    return datetime.fromtimestamp(time.time() + seconds, tz=timezone.utc).isoformat()
+
+
+@lru_cache(maxsize=1)
+def _health_ts(bucket: int) -> str:
+    # Liveness probes hit /api/health every few seconds; format the UTC
+    # timestamp once per second instead of per request, with the Z suffix
+    # produced directly rather than via .replace().
+    return datetime.fromtimestamp(bucket, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
 _backend_dir = Path(__file__).resolve().parent
 load_dotenv(_backend_dir / ".env")
 load_dotenv(_backend_dir.parent / ".env")
 
+# Environment is fixed for the process lifetime; read it once instead of
+# walking os.environ on every request.
+ENV = os.getenv("ENV", "development")
+CRON_SECRET = os.getenv("CRON_SECRET", "").strip()
+_CRON_SECRET_BYTES = CRON_SECRET.encode()
+CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:5173").split(",")
+
 app = FastAPI(
     title="llms.txt Generator",
     description="Generate llms.txt files for any website",
@@ -38,15 +66,26 @@ app = FastAPI(
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=os.getenv("CORS_ORIGINS", "http://localhost:5173").split(","),
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
 
-URL_PATTERN = re.compile(r"^https?://[^\s/$.?#].[^\s]*$", re.IGNORECASE)
 MAX_URL_LEN = 2048
+_VALID_PREFIXES = ("http://", "https://")
+_URL_ADAPTER = TypeAdapter(HttpUrl)
+
+
+def _validate_url(v: str) -> str:
+    """Validate a crawl URL: cheap length/prefix reject first, then the
+    Rust-backed pydantic URL parser for structure."""
+    v = v.strip()
+    if not v or len(v) > MAX_URL_LEN or not v.startswith(_VALID_PREFIXES):
+        raise ValueError("Invalid or missing URL")
+    _URL_ADAPTER.validate_python(v)
+    return v
 
 
 class GenerateResponse(BaseModel):
@@ -54,14 +93,44 @@ class GenerateResponse(BaseModel):
     site_id: int | None = None
 
 
-def _crawl_and_generate(url: str, site_name: str | None, summary: str | None):
-    from crawler import CrawlOptions, crawl_site
-    from generator import GeneratorOptions, generate_llms_txt
+# PageInfo defines defaults for all of these, so one attrgetter tuple read
+# per page replaces three-plus fallback-armed getattr calls.
+_page_fields = attrgetter("url", "title", "description", "etag", "last_modified")
+
+
+def _pages_to_raw(pages) -> list[dict]:
+    return [
+        {"url": u, "title": t, "description": d, "etag": e, "last_modified": lm}
+        for u, t, d, e, lm in map(_page_fields, pages)
+    ]
+
 
+def _load_previous_pages(site_id: int) -> dict[str, dict]:
+    """URL -> raw page dict from the site's latest crawl, for conditional requests."""
+    latest = db.crawl_result_get_latest(site_id)
+    if not latest:
+        return {}
+    raw = latest.get("raw_pages")
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            return {}
+    if not isinstance(raw, list):
+        return {}
+    return {p["url"]: p for p in raw if isinstance(p, dict) and p.get("url")}
+
+
+async def _crawl_and_generate(
+    url: str,
+    site_name: str | None,
+    summary: str | None,
+    previous_pages: dict[str, dict] | None = None,
+):
     logger.info("Starting crawl and generate for url=%s", url)
-    opts = CrawlOptions(max_pages=10, crawl_delay=0.3, timeout=15)
+    opts = CrawlOptions(max_pages=10, crawl_delay=0.3, timeout=15, previous_pages=previous_pages or None)
     try:
-        pages = crawl_site(url, options=opts)
+        pages = await crawl_site(url, options=opts)
     except Exception as e:
         logger.exception("Crawl failed for url=%s", url)
         raise HTTPException(status_code=502, detail=f"Crawl failed: {str(e)}")
@@ -78,31 +147,110 @@ def _crawl_and_generate(url: str, site_name: str | None, summary: str | None):
     return pages, content
 
 
-def _crawl_site_and_save(site_id: int) -> tuple[bool, str]:
-    site = db.site_get_by_id(site_id)
+def _persist_crawl(site_id: int, pages, content: str, monitor_schedule: str | None) -> int:
+    """Shared crawl-completion path: serialize the pages, persist result +
+    llms.txt + schedule in one transaction, and return the crawl_result id."""
+    raw_pages = _pages_to_raw(pages)
+    next_at = _next_crawl_at(monitor_schedule)
+    crawl_result_id = db.persist_crawl(site_id, raw_pages, content, next_at)
+    logger.info("Saved crawl for site_id=%d: %d pages, next_crawl_at=%s", site_id, len(pages), next_at)
+    return crawl_result_id
+
+
+async def _crawl_site_and_save(site_id: int) -> tuple[bool, str]:
+    # The db helpers are blocking round-trips (network calls on Postgres);
+    # run them in the threadpool so they can't stall the event loop that
+    # every request and crawl worker shares.
+    site = await asyncio.to_thread(db.site_get_by_id, site_id)
     if not site:
         return False, "Site not found"
     url = site["root_url"]
     try:
-        pages, content = _crawl_and_generate(url, site.get("name"), None)
+        previous = await asyncio.to_thread(_load_previous_pages, site_id)
+        pages, content = await _crawl_and_generate(url, site.get("name"), None, previous_pages=previous)
     except HTTPException as e:
         return False, str(e.detail)
     except Exception as e:
         logger.exception("Crawl failed for site_id=%d", site_id)
         return False, str(e)
-    raw_pages = [{"url": getattr(p, "url", ""), "title": getattr(p, "title", ""), "description": getattr(p, "description", "")} for p in pages]
-    crawl_result_id = db.crawl_result_save(site_id, len(raw_pages), raw_pages)
-    db.llms_txt_save(site_id, crawl_result_id, content)
-    next_at = _next_crawl_at(site.get("monitor_schedule"))
-    db.site_update_next_crawl_at(site_id, next_at)
-    logger.info("Cron crawl done for site_id=%d, next_crawl_at=%s", site_id, next_at)
+    await asyncio.to_thread(_persist_crawl, site_id, pages, content, site.get("monitor_schedule"))
     return True, "OK"
 
 
+# Long-lived crawl workers: endpoints enqueue site ids instead of spawning a
+# BackgroundTasks thread per crawl, so a burst of due sites can't saturate
+# the threadpool - concurrency is capped at CRAWL_WORKERS.
+CRAWL_WORKERS = int(os.getenv("CRAWL_WORKERS", "4"))
+
+
+async def _enqueue_crawl(site_id: int) -> bool:
+    """Queue a crawl unless one for this site is already queued or running.
+
+    Cron waves and manual refreshes can target the same site within seconds;
+    coalescing at enqueue time means the duplicate caller skips (or awaits)
+    instead of repeating the whole crawl + generate + persist cycle."""
+    async with app.state.inflight_lock:
+        if site_id in app.state.inflight:
+            return False
+        app.state.inflight[site_id] = asyncio.get_running_loop().create_future()
+    await app.state.crawl_queue.put(site_id)
+    return True
+
+
+async def _finish_crawl(site_id: int, result: tuple[bool, str]) -> None:
+    """Resolve and drop the in-flight marker; wakes any awaiting duplicates."""
+    async with app.state.inflight_lock:
+        fut = app.state.inflight.pop(site_id, None)
+    if fut is not None and not fut.done():
+        fut.set_result(result)
+
+
+async def _crawl_worker():
+    q = app.state.crawl_queue
+    while True:
+        site_id = await q.get()
+        result: tuple[bool, str] = (False, "Crawl worker error")
+        try:
+            result = await _crawl_site_and_save(site_id)
+        except Exception:
+            logger.exception("Crawl worker failed for site_id=%d", site_id)
+        finally:
+            await _finish_crawl(site_id, result)
+            q.task_done()
+
+
 @app.on_event("startup")
-def startup():
-    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+async def startup():
+    # Route log records through an in-process queue: emitting is just a
+    # queue put, and the blocking stream write (plus the logging module's
+    # per-handler lock) moves to the listener thread instead of stalling
+    # the event loop.
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+    log_queue: SimpleQueue = SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(QueueHandler(log_queue))
+    app.state.log_listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    app.state.log_listener.start()
     db.init_db()
+    app.state.crawl_queue = asyncio.Queue(maxsize=1024)
+    app.state.inflight = {}
+    app.state.inflight_lock = asyncio.Lock()
+    app.state.crawl_workers = [asyncio.create_task(_crawl_worker()) for _ in range(CRAWL_WORKERS)]
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    workers = getattr(app.state, "crawl_workers", [])
+    for w in workers:
+        w.cancel()
+    if workers:
+        await asyncio.gather(*workers, return_exceptions=True)
+    await close_session()
+    listener = getattr(app.state, "log_listener", None)
+    if listener is not None:
+        listener.stop()
 
 
 @app.get("/api/health")
@@ -112,8 +260,8 @@ def health():
     return {
         "ok": True,
         "service": "llms-txt-generator",
-        "env": os.getenv("ENV", "development"),
-        "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        "env": ENV,
+        "timestamp": _health_ts(int(time.time())),
     }
 
 
@@ -125,30 +273,28 @@ class SiteCreateRequest(BaseModel):
     @field_validator("url")
     @classmethod
     def url_valid(cls, v: str) -> str:
-        v = v.strip()
-        if not v or len(v) > MAX_URL_LEN or not URL_PATTERN.match(v):
-            raise ValueError("Invalid or missing URL")
-        return v
+        return _validate_url(v)
 
 
 @app.post("/api/sites")
-def sites_create(background_tasks: BackgroundTasks, body: SiteCreateRequest):
+async def sites_create(body: SiteCreateRequest):
     """Create a new monitored site. Validates URL, creates the site record, and queues an
-    initial crawl in the background. Returns immediately with the created site.
+    initial crawl on the worker pool. Returns immediately with the created site.
     Raises 409 if the URL already exists. Crawl runs async; use GET /api/sites to see
     when last_generated_at appears."""
     try:
-        existing = db.site_get_by_url(body.url)
+        existing = await asyncio.to_thread(db.site_get_by_url, body.url)
         if existing:
             raise HTTPException(status_code=409, detail="Site with this URL already exists")
-        site = db.site_create(
+        site = await asyncio.to_thread(
+            db.site_create,
             root_url=body.url,
             name=body.name,
             monitor_schedule=body.monitor_schedule or "15min",
         )
         if not site or "id" not in site:
             raise HTTPException(status_code=502, detail="Database error: failed to create site")
-        background_tasks.add_task(_crawl_site_and_save, site["id"])
+        await _enqueue_crawl(site["id"])
         return {"id": site["id"], "root_url": site["root_url"], "name": site["name"], "created_at": site["created_at"]}
     except HTTPException:
         raise
@@ -163,71 +309,111 @@ def sites_list():
     return db.site_get_all()
 
 
+_STREAM_CHUNK = 65536
+
+
+def _iter_bytes(data: bytes, chunk_size: int = _STREAM_CHUNK):
+    for i in range(0, len(data), chunk_size):
+        yield data[i:i + chunk_size]
+
+
 @app.get("/api/sites/{site_id}/llms.txt", response_class=PlainTextResponse)
-def site_llms_txt(site_id: int = PathParam(..., ge=1)):
+def site_llms_txt(request: Request, site_id: int = PathParam(..., ge=1)):
     """Return the latest llms.txt content for a site as plain text.
+    Supports If-None-Match revalidation: each generation gets a new row id, so
+    the id doubles as a stable ETag and polling clients get cheap 304s.
     Raises 404 if the site does not exist or no llms.txt has been generated yet."""
-    site = db.site_get_by_id(site_id)
+    site = db.site_get_by_id_cached(site_id)
     if not site:
         raise HTTPException(status_code=404, detail="Site not found")
-    latest = db.llms_txt_get_latest(site_id)
+    latest = db.llms_txt_get_latest_cached(site_id)
     if not latest:
         raise HTTPException(status_code=404, detail="No llms.txt generated yet. Run a crawl first.")
-    return latest["content"]
+    etag = f'W/"{latest["id"]}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    # Encode once and stream in 64 KB chunks: avoids the extra full-body copy
+    # a PlainTextResponse would make and starts sending the first bytes sooner
+    # for multi-MB files.
+    body = latest["content"].encode("utf-8")
+    return StreamingResponse(
+        _iter_bytes(body),
+        media_type="text/plain; charset=utf-8",
+        headers={"ETag": etag, "Cache-Control": "public, max-age=60"},
+    )
 
 
 @app.post("/api/sites/{site_id}/crawl", response_model=GenerateResponse)
-def site_crawl(site_id: int = PathParam(..., ge=1)):
+async def site_crawl(site_id: int = PathParam(..., ge=1)):
     """Manually trigger a crawl for a site (Refresh button). Crawls the site, generates
     llms.txt, saves to DB, and updates next_crawl_at. Returns the generated content.
     Blocks until the crawl completes. Raises 404 if site not found, 502 on crawl failure."""
     logger.info("Crawl requested for site_id=%d", site_id)
-    site = db.site_get_by_id(site_id)
+    site = await asyncio.to_thread(db.site_get_by_id, site_id)
     if not site:
         raise HTTPException(status_code=404, detail="Site not found")
+
+    # If a crawl for this site is already queued or running (cron wave, or a
+    # double-clicked Refresh), wait for that one instead of crawling twice.
+    loop = asyncio.get_running_loop()
+    async with app.state.inflight_lock:
+        fut = app.state.inflight.get(site_id)
+        if fut is None:
+            app.state.inflight[site_id] = loop.create_future()
+    if fut is not None:
+        ok, message = await fut
+        if not ok:
+            raise HTTPException(status_code=502, detail=f"Crawl failed: {message}")
+        latest = await asyncio.to_thread(db.llms_txt_get_latest, site_id)
+        if not latest:
+            raise HTTPException(status_code=502, detail="Crawl produced no content")
+        return GenerateResponse(content=latest["content"])
+
     url = site["root_url"]
-    pages, content = _crawl_and_generate(url, site.get("name"), None)
-    raw_pages = [{"url": getattr(p, "url", ""), "title": getattr(p, "title", ""), "description": getattr(p, "description", "")} for p in pages]
-    crawl_result_id = db.crawl_result_save(site_id, len(raw_pages), raw_pages)
-    db.llms_txt_save(site_id, crawl_result_id, content)
-    next_at = _next_crawl_at(site.get("monitor_schedule"))
-    db.site_update_next_crawl_at(site_id, next_at)
-    logger.info("Saved crawl for site_id=%d: %d pages, next_crawl_at=%s", site_id, len(pages), next_at)
+    ok, message = False, "Crawl failed"
+    try:
+        previous = await asyncio.to_thread(_load_previous_pages, site_id)
+        pages, content = await _crawl_and_generate(url, site.get("name"), None, previous_pages=previous)
+        await asyncio.to_thread(_persist_crawl, site_id, pages, content, site.get("monitor_schedule"))
+        ok, message = True, "OK"
+    except HTTPException as e:
+        message = str(e.detail)
+        raise
+    finally:
+        await _finish_crawl(site_id, (ok, message))
     return GenerateResponse(content=content)
 
 
 @app.post("/api/cron/crawl-due")
-def cron_crawl_due(
-    background_tasks: BackgroundTasks,
+async def cron_crawl_due(
     x_cron_secret: str | None = Header(None, alias="X-Cron-Secret"),
 ):
     """Cron endpoint for scheduled re-crawls. Requires X-Cron-Secret header matching CRON_SECRET.
-    Fetches all sites due for crawl (next_crawl_at is null or in the past), queues each as a
-    background task, and returns immediately with queued count. Call from cron-job.org or similar."""
-    expected = os.getenv("CRON_SECRET", "").strip()
-    if not expected or not x_cron_secret or x_cron_secret != expected:
+    Fetches all sites due for crawl (next_crawl_at is null or in the past), queues each on the
+    crawl worker pool, and returns immediately with queued count. Call from cron-job.org or similar."""
+    # compare_digest: constant-time, so the comparison can't leak secret
+    # bytes through response timing.
+    if (
+        not CRON_SECRET
+        or not x_cron_secret
+        or not hmac.compare_digest(x_cron_secret.encode(), _CRON_SECRET_BYTES)
+    ):
         raise HTTPException(status_code=401, detail="Invalid or missing cron secret")
-    due = db.sites_get_due_for_crawl()
-    if not due:
-        return {"queued": 0}
+    due = await asyncio.to_thread(db.sites_get_due_for_crawl)
+    queued = 0
     for site in due:
-        background_tasks.add_task(_crawl_site_and_save, site["id"])
-    return {"queued": len(due)}
+        if await _enqueue_crawl(site["id"]):
+            queued += 1
+    return {"queued": queued}
 
 
 _frontend_dist = _backend_dir.parent / "frontend" / "dist"
 
+# Mounted after the /api routes, so those still win; StaticFiles serves
+# assets directly (stat caching, ETag/Last-Modified) instead of running a
+# Python catch-all route per asset. html=True serves index.html at /.
 if _frontend_dist.exists():
-    @app.get("/{full_path:path}")
-    def serve_spa(full_path: str):
-        """Serve the built React SPA. Returns static files when they exist; otherwise returns
-        index.html for client-side routing. API routes under /api/ are handled by FastAPI."""
-        if full_path.startswith("api/"):
-            raise HTTPException(status_code=404, detail="Not found")
-        file_path = _frontend_dist / full_path
-        if file_path.is_file():
-            return FileResponse(file_path)
-        return FileResponse(_frontend_dist / "index.html")
+    app.mount("/", StaticFiles(directory=str(_frontend_dist), html=True), name="spa")
 
 
 if __name__ == "__main__":
@@ -238,5 +424,5 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=port,
-        reload=os.getenv("ENV", "development") == "development",
+        reload=ENV == "development",
     )